@@ -0,0 +1,52 @@
+# Augmenting declarations for compiling parser.py with Cython (see setup.py)
+
+cimport cython
+cimport cpython.array
+
+
+cdef class Tokens:
+    cdef readonly str text
+    cdef readonly list types, variants, strings
+    cdef readonly cpython.array.array starts, ends
+    cdef Py_ssize_t depth
+
+    cpdef append(self, str type, str variant, str string,
+                 Py_ssize_t start, Py_ssize_t end)
+
+
+cdef class Element:
+    cdef readonly str tag
+    cdef readonly object value
+    cdef readonly tuple children
+
+cdef class Node(Element):
+    pass
+
+cdef class Collection(Element):
+    pass
+
+
+### --- Parser
+
+@cython.locals(types=list, variants=list, close=str)
+cpdef tuple parse_collection(Tokens tokens, Py_ssize_t i)
+
+@cython.locals(j=Py_ssize_t, escape=bint, variants=list)
+cpdef tuple parse_string(Tokens tokens, Py_ssize_t i)
+
+@cython.locals(type_=str, variant=str)
+cpdef tuple parse_term(Tokens tokens, Py_ssize_t i)
+
+@cython.locals(right=str)
+cpdef tuple parse_post_expression(Tokens tokens, Py_ssize_t i)
+
+@cython.locals(mid=str, prec=int, tag=str)
+cpdef tuple parse_binop(Tokens tokens, Py_ssize_t i, int min_prec=*)
+
+@cython.locals(mid=str)
+cpdef tuple parse_function_expression(Tokens tokens, Py_ssize_t i)
+
+@cython.locals(mid=str)
+cpdef tuple parse_expression(Tokens tokens, Py_ssize_t i)
+
+cpdef parse_tokens(Tokens tokens)
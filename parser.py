@@ -0,0 +1,506 @@
+# https://learn.microsoft.com/en-us/azure/data-factory/concepts-data-flow-expression-builder
+# https://en.wikipedia.org/wiki/Backus%E2%80%93Naur_form
+# https://docs.python.org/3/reference/grammar.html
+
+
+# PowerShell-like syntax (at least for arrays)
+
+# Pure Python, but also compiled as-is by Cython (see parser.pxd and setup.py).
+# When the extension is built it shadows this file on import.
+
+
+import re
+import sys
+from array import array
+from functools import lru_cache
+
+import scanner
+
+# True when built by Cython, which handles this import itself
+try:
+    import cython
+except ImportError:
+    COMPILED = False
+else:
+    COMPILED = cython.compiled
+
+
+tokens = {
+    "operator": {
+        "arrow": "->",
+        "assign": ":=",
+        "add": "+",
+        "minus": "-",
+        "divide": "/",
+        "multiply": "*",
+        "mod": "%",
+        "and": "&&",
+        "or": "||",
+        "xor": "^",  # not "^^"?
+        "bitwiseAnd": "&",
+        "bitwiseOr": "|",
+        "bitwiseXor": "^",  # "|" in docs
+        "equals": "=",
+        "notEquals": "!=",
+        "equalsIgnoreCase": "<=>",
+        "greaterOrEqual": ">=",
+        "lessOrEqual": "<=",
+        "least": "<=",
+        "greater": ">",
+        "lesser": "<",
+        "concat": "+",
+    },
+    "open": {
+        "larray": "@(",
+        "lparen": "(",
+        "lcurly": "{",
+        "lsquare": "[",
+    },
+    "close": {
+        "rparen": ")",
+        "rcurly": "}",
+        "rsquare": "]",
+    },
+    "sep": {
+        "comma": ",",
+    },
+    "string": {
+        "apostrophe": "'",
+        "quotes": '"',
+        "escape": '\\',
+    },
+    # "end": {
+    #     "end": "re:$",
+    # },
+    "number": {
+        "number": "re:(?:\d+|\d*\.\d+)",
+    },
+    "word": {
+        "item": "re:#item(?:_\d+)?",
+        "index": "re:#index(?:_\d+)?",
+        "word": "re:[a-zA-Z_\\\\]+",
+    },
+}
+
+### --- Tokenizer
+
+# Named groups must be valid Python identifiers (str.isidentifier)
+def item(t, k, v): return f"(?P<{t}__{k}>{v})"
+def _pattern(s): return s[3:] if s.startswith("re:") else re.escape(s)
+
+
+class TokenInfo:
+    # A single token, only materialized for error messages (see Tokens.info)
+    __slots__ = ("type", "variant", "string", "start", "end", "line")
+
+    def __init__(self, type, variant, string, start, end, line):
+        self.type = type
+        self.variant = variant
+        self.string = string
+        self.start = start
+        self.end = end
+        self.line = line
+
+    def __repr__(self):
+        return (
+            f"TokenInfo(type={self.type!r}, variant={self.variant!r}, "
+            f"string={self.string!r}, start={self.start}, end={self.end}, "
+            f"line={self.line})"
+        )
+
+
+def position(text, i):
+    # Offset -> (line, column), both for error messages only
+    line = text.count("\n", 0, i) + 1
+    column = i - text.rfind("\n", 0, i) - 1
+    return line, column
+
+
+class Tokens:
+    # Struct of arrays: token i is (types[i], variants[i], strings[i], ...),
+    # so tokenizing allocates no per-token objects. Offsets index into text,
+    # and are stored unboxed. depth is the parser's nesting level.
+    __slots__ = ("text", "types", "variants", "strings", "starts", "ends", "depth")
+
+    def __init__(self, text):
+        self.text = text
+        self.types = []
+        self.variants = []
+        self.strings = []
+        self.starts = array("q")
+        self.ends = array("q")
+        self.depth = 0
+
+    def __len__(self):
+        return len(self.types)
+
+    def append(self, type, variant, string, start, end):
+        self.types.append(type)
+        self.variants.append(variant)
+        self.strings.append(string)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def info(self, i):
+        return TokenInfo(
+            self.types[i],
+            self.variants[i],
+            self.strings[i],
+            self.starts[i],
+            self.ends[i],
+            position(self.text, self.starts[i])[0],
+        )
+
+
+def token_pattern(tokens):
+    pattern = []
+    for type_, type_tokens in tokens.items():
+        for variant, variant_pattern in type_tokens.items():
+            group = item(type_, variant, _pattern(variant_pattern))
+            pattern.append(group)
+
+    # Whitespace is skipped as part of every match rather than being a token
+    pattern = r"\s*(?:" + "|".join(pattern) + ")"
+    pattern = re.compile(pattern)
+    return pattern
+
+
+@lru_cache
+def token_groups(pattern):
+    # Group name -> (type, variant); the inverse of item(). Interned, so the
+    # parser's comparisons against literals are mostly identity checks.
+    return {
+        group: tuple(map(sys.intern, group.split("__")))
+        for group in pattern.groupindex
+    }
+
+
+# The token table is static, so the pattern is compiled once at import
+PATTERN = token_pattern(tokens)
+
+
+# scanner.py hand-codes the default table; should the two drift apart, the
+# regex sweep is used for every text. Whether Numba works is only known once
+# it is imported, see scanner.available().
+SCANNER = scanner.TABLE == tokens
+
+
+# The tokens always end with an "end" token, so the parser can index freely
+def tokenize(text, pattern):
+    if (
+        SCANNER
+        and pattern is PATTERN
+        and len(text) >= scanner.MIN_LENGTH
+        and text.isascii()
+        and scanner.available()
+    ):
+        return scan_tokens(text)
+
+    tokens = Tokens(text)
+    groups = token_groups(pattern)
+    match = pattern.match
+    i = 0
+    # Each match is anchored where the last token ended, so the one that
+    # fails is tried once. finditer retried it at every later offset, which
+    # is quadratic in trailing whitespace.
+    while True:
+        m = match(text, i)
+        if m is None:
+            break
+        group = m.lastgroup
+        type_, variant = groups[group]
+        start, i = m.span(group)
+        tokens.append(type_, variant, m[group], start, i)
+    rest = text[i:]
+    if rest.strip():
+        line, column = position(text, len(text) - len(rest.lstrip()))
+        raise TokenError(f"Invalid token at line {line}, column {column}")
+    tokens.append("end", "end", "", len(text), len(text))
+    return tokens
+
+
+SCAN_TYPES = tuple(sys.intern(type_) for type_, _ in scanner.KINDS)
+SCAN_VARIANTS = tuple(sys.intern(variant) for _, variant in scanner.KINDS)
+
+
+def scan_tokens(text):
+    # tokenize() for PATTERN and ASCII text through scanner.scan()
+    count, kinds, starts, ends = scanner.scan_text(text)
+    if count < 0:
+        line, column = position(text, -1 - count)
+        raise TokenError(f"Invalid token at line {line}, column {column}")
+    tokens = Tokens(text)
+    tokens.starts.frombytes(starts)
+    tokens.ends.frombytes(ends)
+    tokens.types.extend([SCAN_TYPES[kind] for kind in kinds])
+    tokens.variants.extend([SCAN_VARIANTS[kind] for kind in kinds])
+    tokens.strings.extend(
+        [text[start:end] for start, end in zip(tokens.starts, tokens.ends)]
+    )
+    tokens.append("end", "end", "", len(text), len(text))
+    return tokens
+
+### --- Nodes
+
+_setattr = object.__setattr__
+
+
+class Element:
+    # Plain slotted nodes. parse() caches its trees, so they are shared and
+    # immutable: attributes are only set in __init__, children is a tuple.
+    __slots__ = ("tag", "value", "children")
+
+    def __init__(self, tag, value=None, children=()):
+        if COMPILED:
+            # C fields, declared readonly in parser.pxd
+            self.tag = tag
+            self.value = value
+            self.children = tuple(children)
+        else:
+            _setattr(self, "tag", tag)
+            _setattr(self, "value", value)
+            _setattr(self, "children", tuple(children))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"<{self._name()} />"
+
+    def _name(self):
+        if self.value is None:
+            return self.tag
+        return f'{self.tag} value="{self.value}"'
+
+
+class Node(Element):
+    __slots__ = ()
+
+    def __init__(self, tag, value=None):
+        super().__init__(tag, value)
+
+    def __repr__(self):
+        return f"<{self.tag}>{self.value}</{self.tag}>"
+
+
+class Collection(Element):
+    __slots__ = ()
+
+    def __init__(self, tag, children=()):
+        super().__init__(tag, None, children)
+
+    def __repr__(self):
+        return f"<{self._name()} with {len(self.children)} children>"
+
+
+### --- Types
+
+def number(string):
+    # The number token is \d+ or \d*\.\d+, so a dot means float
+    return float(string) if "." in string else int(string)
+
+
+class TokenError(ValueError):
+    pass
+
+
+### --- Parser
+
+CLOSE = {"larray": "rparen", "lparen": "rparen", "lcurly": "rcurly", "lsquare": "rsquare"}
+
+# Nesting limit for brackets and prefix operators. The compiled build calls
+# between parse functions in C, where Python's recursion limit never applies;
+# 200 levels fit in a 256 KiB thread stack.
+MAX_DEPTH = 200
+
+
+def parse_collection(tokens, i):
+    # tokens[i-1] is the opening bracket; one peek per element decides
+    # between closing, a separator, or the next element
+    types, variants = tokens.types, tokens.variants
+    close = CLOSE[variants[i-1]]
+    tokens.depth += 1
+    if tokens.depth > MAX_DEPTH:
+        raise RecursionError(f"Nested too deeply at {tokens.info(i-1)}")
+    arguments = []
+    while types[i] != "close":
+        i, expr = parse_function_expression(tokens, i)
+        arguments.append(expr)
+        if variants[i] == "comma":
+            i += 1
+
+    if variants[i] != close:
+        raise TokenError(f"Expected '{close}' at {tokens.info(i)}")
+    tokens.depth -= 1
+    return i+1, arguments
+
+
+def parse_string(tokens, i):
+    # Tokens are only scanned to find the closing quote; the value is the
+    # source text between the quotes, with escapes left as written
+    variants = tokens.variants
+    start = variants[i-1]
+    escape = False
+    for j in range(i, len(tokens)):
+        if escape:
+            escape = False
+            continue
+        if variants[j] == start:
+            return j+1, Node("STR", tokens.text[tokens.ends[i-1]:tokens.starts[j]])
+        if variants[j] == "escape":
+            escape = True
+    raise TokenError(f"Unterminated string at {tokens.info(i-1)}")
+
+
+# Prefix operators, parsed by parse_term
+UNARY = frozenset(("add", "minus"))
+
+
+def parse_term(tokens, i):
+    type_ = tokens.types[i]
+    variant = tokens.variants[i]
+    string = tokens.strings[i]
+    i += 1
+
+    if type_ == "word":
+        return i, Node("VAR", string)
+    elif type_ == "open":
+        i, coll = parse_collection(tokens, i)
+        if variant == "lsquare":
+            return i, Collection("LIST", coll)
+        elif variant == "lparen":
+            # This is a 1-child node and can be omitted
+            return i, Collection("PAREN", coll)
+        else:
+            raise NotImplementedError(f"Not implemented '{variant}'")
+    elif type_ == "number":
+        return i, Node("NUM", number(string))
+    elif type_ == "string":
+        i, string = parse_string(tokens, i)
+        return i, string
+    elif type_ == "operator":
+        if variant in UNARY:
+            tokens.depth += 1
+            if tokens.depth > MAX_DEPTH:
+                raise RecursionError(f"Nested too deeply at {tokens.info(i-1)}")
+            i, arg = parse_term(tokens, i)
+            tokens.depth -= 1
+            return i, Collection("UNOP", (Node("OP", string), arg))
+        else:
+            raise NotImplementedError(f"Not implemented '{variant}'")
+    else:
+        raise TokenError(f"Invalid expression at {tokens.info(i-1)}")
+
+
+def parse_post_expression(tokens, i):
+    i, left = parse_term(tokens, i)
+
+    while True:
+        right = tokens.variants[i]
+
+        if tokens.types[i] == "open":
+            i, coll = parse_collection(tokens, i+1)
+            if right == "lparen":
+                left = Collection("CALL", (left, Collection("ARGS", coll)))
+            elif right == "lsquare":
+                left = Collection("GET", (left, Collection("KEY", coll)))
+            else:
+                raise NotImplementedError(f"Not implemented '{right}'")
+        else:
+            expr = left
+            break
+
+    return i, expr
+
+
+# Binary operators: variant -> (precedence, tag), all left-associative
+PREC = {
+    "multiply": (4, "PRODOP"),
+    "divide": (4, "PRODOP"),
+    "add": (3, "SUMOP"),
+    "minus": (3, "SUMOP"),
+    "equals": (2, "COMPARE"),
+    "notEquals": (2, "COMPARE"),
+    "greater": (2, "COMPARE"),
+    "lesser": (2, "COMPARE"),
+    "and": (1, "LOGICAL"),
+    "or": (1, "LOGICAL"),
+}
+
+
+def parse_binop(tokens, i, min_prec=0):
+    # Precedence climbing over PREC; operands are postfix expressions
+    i, left = parse_post_expression(tokens, i)
+
+    while True:
+        mid = tokens.variants[i]
+        prec, tag = PREC.get(mid, (-1, None))
+
+        if prec < min_prec:
+            break
+        op = Node("OP", tokens.strings[i])
+        i, right = parse_binop(tokens, i+1, prec+1)
+        left = Collection(tag, (left, op, right))
+
+    return i, left
+
+
+def parse_function_expression(tokens, i):
+    i, left = parse_binop(tokens, i)
+    mid = tokens.variants[i]
+
+    if mid == "arrow":
+        i, right = parse_binop(tokens, i+1)
+        return i, Collection("FUNC", (left, right))
+    else:
+        return i, left
+
+
+def parse_expression(tokens, i):
+    i, left = parse_binop(tokens, i)
+    mid = tokens.variants[i]
+
+    if mid == "assign":
+        i, right = parse_binop(tokens, i+1)
+        return i, Collection("ASSIGN", (left, right))
+    else:
+        return i, left
+
+
+# Bare words and integers are parsed without tokenizing. These only agree
+# with the default token table, so they are skipped for any other pattern.
+FAST_WORD = re.compile(r"\s*([a-zA-Z_][a-zA-Z_\\]*)\s*")
+FAST_NUM = re.compile(r"\s*(\d+)\s*")
+
+
+# Repeated inputs return the same tree object (see Element). Longer texts
+# are not cached, as the cache would keep each of them alive.
+CACHE_MAX_LENGTH = 1000
+
+
+def parse(text, pattern=PATTERN):
+    if len(text) > CACHE_MAX_LENGTH:
+        return _parse(text, pattern)
+    return _cached_parse(text, pattern)
+
+
+def _parse(text, pattern):
+    if pattern is PATTERN:
+        if m := FAST_WORD.fullmatch(text):
+            return Node("VAR", m[1])
+        if m := FAST_NUM.fullmatch(text):
+            return Node("NUM", number(m[1]))
+
+    return parse_tokens(tokenize(text, pattern))
+
+
+_cached_parse = lru_cache(maxsize=1024)(_parse)
+
+
+def parse_tokens(tokens):
+    # For callers that already hold the Tokens of a text, e.g. to highlight it
+    tokens.depth = 0
+    return parse_expression(tokens, 0)[1]
@@ -0,0 +1,301 @@
+# Hand-written scanner for the default token table (parser.tokens)
+#
+# A byte-level state machine that agrees with PATTERN on ASCII input, written
+# in the subset of Python that Numba compiles. It only produces token kinds
+# and offsets; parser.tokenize() turns those into Tokens. Kept out of
+# parser.py because Numba cannot compile functions built by Cython.
+
+import importlib.util
+from array import array
+
+# Numba is only imported for the first text scanned (see available()); until
+# then np is None. Cleared if the import fails.
+NUMBA = importlib.util.find_spec("numba") is not None
+np = None
+
+# Shorter texts go through the regex sweep. Per call the compiled scanner
+# wins at any length, but importing Numba takes about half a second (and
+# compiling scan() on a cold cache a few more), which only large inputs
+# earn back.
+MIN_LENGTH = 100_000
+
+
+# The token table scan() hand-codes, a copy of parser.tokens. parser only
+# uses the scanner while the two are equal.
+TABLE = {
+    "operator": {
+        "arrow": "->",
+        "assign": ":=",
+        "add": "+",
+        "minus": "-",
+        "divide": "/",
+        "multiply": "*",
+        "mod": "%",
+        "and": "&&",
+        "or": "||",
+        "xor": "^",  # not "^^"?
+        "bitwiseAnd": "&",
+        "bitwiseOr": "|",
+        "bitwiseXor": "^",  # "|" in docs
+        "equals": "=",
+        "notEquals": "!=",
+        "equalsIgnoreCase": "<=>",
+        "greaterOrEqual": ">=",
+        "lessOrEqual": "<=",
+        "least": "<=",
+        "greater": ">",
+        "lesser": "<",
+        "concat": "+",
+    },
+    "open": {
+        "larray": "@(",
+        "lparen": "(",
+        "lcurly": "{",
+        "lsquare": "[",
+    },
+    "close": {
+        "rparen": ")",
+        "rcurly": "}",
+        "rsquare": "]",
+    },
+    "sep": {
+        "comma": ",",
+    },
+    "string": {
+        "apostrophe": "'",
+        "quotes": '"',
+        "escape": '\\',
+    },
+    "number": {
+        "number": r"re:(?:\d+|\d*\.\d+)",
+    },
+    "word": {
+        "item": r"re:#item(?:_\d+)?",
+        "index": r"re:#index(?:_\d+)?",
+        "word": r"re:[a-zA-Z_\\]+",
+    },
+}
+
+# Table order, so the first listed variant wins on ties
+KINDS = tuple(
+    (type_, variant) for type_, group in TABLE.items() for variant in group
+)
+
+_KIND = {variant: kind for kind, (_, variant) in enumerate(KINDS)}
+
+ARROW = _KIND["arrow"]
+ASSIGN = _KIND["assign"]
+MINUS = _KIND["minus"]
+AND = _KIND["and"]
+OR = _KIND["or"]
+BITWISE_AND = _KIND["bitwiseAnd"]
+BITWISE_OR = _KIND["bitwiseOr"]
+NOT_EQUALS = _KIND["notEquals"]
+EQUALS_IGNORE_CASE = _KIND["equalsIgnoreCase"]
+GREATER_OR_EQUAL = _KIND["greaterOrEqual"]
+LESS_OR_EQUAL = _KIND["lessOrEqual"]
+GREATER = _KIND["greater"]
+LESSER = _KIND["lesser"]
+LARRAY = _KIND["larray"]
+NUMBER = _KIND["number"]
+ITEM = _KIND["item"]
+INDEX = _KIND["index"]
+WORD = _KIND["word"]
+
+
+### --- Character classes
+
+# LUT[byte] is a kind for tokens that are always one character long,
+# otherwise one of these classes (all negative)
+SPACE = -1
+INVALID = -2
+DIGIT = -3
+LETTER = -4
+SPECIAL = -5  # needs lookahead, see scan()
+
+
+def _lut():
+    lut = [INVALID] * 256
+    for c in " \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f":  # what str.isspace() accepts
+        lut[ord(c)] = SPACE
+    for c in "0123456789":
+        lut[ord(c)] = DIGIT
+    for c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_":
+        lut[ord(c)] = LETTER
+    for c in "-:&|!<>@.#":
+        lut[ord(c)] = SPECIAL
+    for c, variant in (
+        ("+", "add"),
+        ("/", "divide"),
+        ("*", "multiply"),
+        ("%", "mod"),
+        ("^", "xor"),
+        ("=", "equals"),
+        ("(", "lparen"),
+        ("{", "lcurly"),
+        ("[", "lsquare"),
+        (")", "rparen"),
+        ("}", "rcurly"),
+        ("]", "rsquare"),
+        (",", "comma"),
+        ("'", "apostrophe"),
+        ('"', "quotes"),
+        ("\\", "escape"),
+    ):
+        lut[ord(c)] = _KIND[variant]
+    return tuple(lut)
+
+
+LUT = _lut()
+
+C_MINUS, C_COLON, C_AMP, C_PIPE, C_BANG, C_LT, C_GT, C_AT, C_DOT, C_HASH = (
+    map(ord, "-:&|!<>@.#")
+)
+C_EQ, C_LPAREN, C_UNDERSCORE, C_BACKSLASH = map(ord, "=(_\\")
+ITEM_BYTES = tuple(b"item")
+INDEX_BYTES = tuple(b"index")
+
+
+### --- Scanner
+
+def _at(buf, i, n, word):
+    # buf[i:] starts with word
+    if i + len(word) > n:
+        return False
+    for k in range(len(word)):
+        if buf[i+k] != word[k]:
+            return False
+    return True
+
+
+def _digits(buf, i, n):
+    while i < n and LUT[buf[i]] == DIGIT:
+        i += 1
+    return i
+
+
+def scan(buf, kinds, starts, ends):
+    # Fills kinds/starts/ends (each at least len(buf) long) and returns the
+    # token count, or -1 - offset of the first character no token matches
+    n = len(buf)
+    count = 0
+    i = 0
+    while True:
+        while i < n and LUT[buf[i]] == SPACE:
+            i += 1
+        if i == n:
+            return count
+
+        start = i
+        c = buf[i]
+        kind = LUT[c]
+        nxt = buf[i+1] if i + 1 < n else 0
+        i += 1
+
+        if kind >= 0:
+            pass
+        elif kind == DIGIT:
+            kind = NUMBER
+            i = _digits(buf, i, n)
+        elif kind == LETTER:
+            kind = WORD
+            while i < n and (LUT[buf[i]] == LETTER or buf[i] == C_BACKSLASH):
+                i += 1
+        elif kind == SPECIAL:
+            kind = INVALID
+            if c == C_MINUS:
+                kind = MINUS
+                if nxt == C_GT:
+                    kind, i = ARROW, i + 1
+            elif c == C_COLON:
+                if nxt == C_EQ:
+                    kind, i = ASSIGN, i + 1
+            elif c == C_AMP:
+                kind = BITWISE_AND
+                if nxt == C_AMP:
+                    kind, i = AND, i + 1
+            elif c == C_PIPE:
+                kind = BITWISE_OR
+                if nxt == C_PIPE:
+                    kind, i = OR, i + 1
+            elif c == C_BANG:
+                if nxt == C_EQ:
+                    kind, i = NOT_EQUALS, i + 1
+            elif c == C_LT:
+                kind = LESSER
+                if nxt == C_EQ:
+                    kind, i = LESS_OR_EQUAL, i + 1
+                    if i < n and buf[i] == C_GT:
+                        kind, i = EQUALS_IGNORE_CASE, i + 1
+            elif c == C_GT:
+                kind = GREATER
+                if nxt == C_EQ:
+                    kind, i = GREATER_OR_EQUAL, i + 1
+            elif c == C_AT:
+                if nxt == C_LPAREN:
+                    kind, i = LARRAY, i + 1
+            elif c == C_DOT:
+                if LUT[nxt] == DIGIT:
+                    kind, i = NUMBER, _digits(buf, i, n)
+            elif c == C_HASH:
+                if _at(buf, i, n, ITEM_BYTES):
+                    kind, i = ITEM, i + len(ITEM_BYTES)
+                elif _at(buf, i, n, INDEX_BYTES):
+                    kind, i = INDEX, i + len(INDEX_BYTES)
+                # Optional _<digits> suffix
+                if kind != INVALID and i + 1 < n and buf[i] == C_UNDERSCORE:
+                    if LUT[buf[i+1]] == DIGIT:
+                        i = _digits(buf, i + 1, n)
+
+        if kind < 0:
+            return -1 - start
+        kinds[count] = kind
+        starts[count] = start
+        ends[count] = i
+        count += 1
+
+
+def _compile():
+    # Swaps scan() and its helpers for their Numba versions, in place
+    global np, _at, _digits, scan
+    import numpy
+    from numba import njit
+
+    _at = njit(cache=True)(_at)
+    _digits = njit(cache=True)(_digits)
+    scan = njit(cache=True, nogil=True)(scan)
+    np = numpy
+
+
+def available():
+    # Whether the compiled scan() can be used, compiling it on first call.
+    # An installed but broken Numba (or numpy) switches it off for good.
+    global NUMBA
+    if NUMBA and np is None:
+        try:
+            _compile()
+        except ImportError:
+            NUMBA = False
+    return NUMBA
+
+
+def scan_text(text):
+    # ASCII text -> (count, kinds, starts, ends), see scan(). kinds is a list;
+    # starts and ends are raw int64 bytes, for array("q").frombytes().
+    if not available():
+        # Without Numba scan() runs as plain Python, e.g. in the tests
+        buf = text.encode("ascii")
+        kinds = [0] * len(buf)
+        starts = array("q", [0]) * len(buf)
+        ends = array("q", [0]) * len(buf)
+    else:
+        buf = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        kinds = np.empty(len(buf), dtype=np.intp)
+        starts = np.empty(len(buf), dtype=np.int64)
+        ends = np.empty(len(buf), dtype=np.int64)
+    count = scan(buf, kinds, starts, ends)
+    if count < 0:
+        return count, None, None, None
+    starts, ends = starts[:count].tobytes(), ends[:count].tobytes()
+    kinds = kinds[:count] if np is None else kinds[:count].tolist()
+    return count, kinds, starts, ends
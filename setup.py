@@ -0,0 +1,12 @@
+# Optional Cython build of parser.py; without it the pure Python module is used
+#
+#     python setup.py build_ext --inplace
+
+from setuptools import setup
+from Cython.Build import cythonize
+
+
+setup(
+    name="sample-parser",
+    ext_modules=cythonize("parser.py", language_level=3),
+)
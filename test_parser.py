@@ -0,0 +1,169 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+import parser
+
+
+HERE = Path(__file__).parent
+
+
+def dump(el):
+    # Compact tree shape, e.g. SUMOP(VAR['a'], OP['+'], NUM[1])
+    if el.children:
+        return f"{el.tag}({', '.join(map(dump, el.children))})"
+    return f"{el.tag}[{el.value!r}]"
+
+
+class DeepNestingTest(unittest.TestCase):
+    # Each input runs in a subprocess, since without the depth limit the
+    # compiled build crashes the interpreter instead of raising
+    INPUTS = [
+        '"-" * 100000 + "1"',
+        '"(" * 20000 + "1" + ")" * 20000',
+        '"[" * 20000 + "]" * 20000',
+        '"f" + "(f" * 20000 + ")" * 20000',
+        '"-(" * 20000 + "1" + ")" * 20000',
+    ]
+
+    def test_raises_recursion_error(self):
+        for source in self.INPUTS:
+            with self.subTest(source):
+                code = (
+                    "import parser\n"
+                    "try:\n"
+                    f"    parser.parse({source})\n"
+                    "except RecursionError:\n"
+                    "    print('RecursionError')\n"
+                )
+                result = subprocess.run(
+                    [sys.executable, "-c", code],
+                    cwd=HERE,
+                    capture_output=True,
+                    text=True,
+                )
+                self.assertEqual(result.returncode, 0, result.stderr)
+                self.assertEqual(result.stdout, "RecursionError\n")
+
+    def test_nesting_within_limit(self):
+        tree = parser.parse("(" * 100 + "1" + ")" * 100)
+        for _ in range(100):
+            self.assertEqual(tree.tag, "PAREN")
+            tree = tree.children[0]
+        self.assertEqual(tree.value, 1)
+
+
+class StringAndTokenTest(unittest.TestCase):
+    def test_multiline_string_keeps_newline(self):
+        self.assertEqual(parser.parse("'a\nb'").value, "a\nb")
+
+    def test_unterminated_string(self):
+        for text in ("'abc", '"abc', "f('abc)"):
+            with self.subTest(text):
+                with self.assertRaisesRegex(parser.TokenError, "Unterminated string"):
+                    parser.parse(text)
+
+    def test_invalid_token_position(self):
+        with self.assertRaisesRegex(
+            parser.TokenError, "Invalid token at line 2, column 2"
+        ):
+            parser.parse("a +\n  ~")
+
+
+class PrecedenceTest(unittest.TestCase):
+    CASES = {
+        "a > b + c": "COMPARE(VAR['a'], OP['>'], SUMOP(VAR['b'], OP['+'], VAR['c']))",
+        "a + b > c": "COMPARE(SUMOP(VAR['a'], OP['+'], VAR['b']), OP['>'], VAR['c'])",
+        "a = b * c": "COMPARE(VAR['a'], OP['='], PRODOP(VAR['b'], OP['*'], VAR['c']))",
+        "a - b - c": "SUMOP(SUMOP(VAR['a'], OP['-'], VAR['b']), OP['-'], VAR['c'])",
+        "a / b * c": "PRODOP(PRODOP(VAR['a'], OP['/'], VAR['b']), OP['*'], VAR['c'])",
+        "a * b + c / d": (
+            "SUMOP(PRODOP(VAR['a'], OP['*'], VAR['b']), OP['+'], "
+            "PRODOP(VAR['c'], OP['/'], VAR['d']))"
+        ),
+        # && and || share a level, so they group left to right
+        "a || b && c": (
+            "LOGICAL(LOGICAL(VAR['a'], OP['||'], VAR['b']), OP['&&'], VAR['c'])"
+        ),
+        "a < b && c > d": (
+            "LOGICAL(COMPARE(VAR['a'], OP['<'], VAR['b']), OP['&&'], "
+            "COMPARE(VAR['c'], OP['>'], VAR['d']))"
+        ),
+    }
+
+    def test_tree_shape(self):
+        for text, expected in self.CASES.items():
+            with self.subTest(text):
+                self.assertEqual(dump(parser.parse(text)), expected)
+
+    def test_missing_operand(self):
+        # Used to parse as f=a, dropping the rest
+        with self.assertRaises(NotImplementedError):
+            parser.parse("f=a-||")
+
+
+class BracketTest(unittest.TestCase):
+    VALID = {
+        "f(a)": "CALL(VAR['f'], ARGS(VAR['a']))",
+        "f()": "CALL(VAR['f'], ARGS[None])",
+        "x[1]": "GET(VAR['x'], KEY(NUM[1]))",
+        "[1, 2]": "LIST(NUM[1], NUM[2])",
+        "[1, 2,]": "LIST(NUM[1], NUM[2])",
+        "[]": "LIST[None]",
+        "(a)": "PAREN(VAR['a'])",
+    }
+
+    def test_valid(self):
+        for text, expected in self.VALID.items():
+            with self.subTest(text):
+                self.assertEqual(dump(parser.parse(text)), expected)
+
+    def test_mismatched_closer(self):
+        for text in ("f(a]", "[1, 2)", "x[1)", "(a]"):
+            with self.subTest(text):
+                with self.assertRaisesRegex(parser.TokenError, "Expected"):
+                    parser.parse(text)
+
+    def test_unclosed(self):
+        for text in ("[1, 2", "f(a", "(a"):
+            with self.subTest(text):
+                with self.assertRaises(parser.TokenError):
+                    parser.parse(text)
+
+
+class WhitespaceTest(unittest.TestCase):
+    # Quadratic in the run of spaces before the regex sweep was anchored;
+    # at this length that took minutes
+    SPACES = " " * 50_000
+
+    def test_trailing_whitespace(self):
+        self.assertEqual(parser.parse("a + b" + self.SPACES).tag, "SUMOP")
+
+    def test_whitespace_before_invalid_token(self):
+        with self.assertRaises(parser.TokenError):
+            parser.parse("a" + self.SPACES + "~")
+
+
+class CacheTest(unittest.TestCase):
+    def test_cached_tree_is_not_mutable(self):
+        # parse() returns the same tree for the same text
+        tree = parser.parse("f(x, y) + 1")
+        self.assertIs(parser.parse("f(x, y) + 1"), tree)
+        for node in (tree, tree.children[0], tree.children[2]):
+            for name in ("tag", "value", "children"):
+                with self.subTest(node=node, name=name):
+                    with self.assertRaises(AttributeError):
+                        setattr(node, name, None)
+            with self.assertRaises(AttributeError):
+                del node.tag
+        self.assertIsInstance(tree.children[0].children[1].children, tuple)
+        self.assertEqual(parser.parse("f(x, y) + 1").tag, "SUMOP")
+
+    def test_long_text_is_not_cached(self):
+        text = "x + 1" * (parser.CACHE_MAX_LENGTH // 5 + 1)
+        self.assertIsNot(parser.parse(text), parser.parse(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
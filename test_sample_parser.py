@@ -0,0 +1,48 @@
+import contextlib
+import importlib.util
+import io
+import unittest
+from pathlib import Path
+
+import parser
+
+
+# The script's name is not a valid module name, so it is loaded by path
+_spec = importlib.util.spec_from_file_location(
+    "sample_parser", Path(__file__).parent / "sample-parser.py"
+)
+sample_parser = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(sample_parser)
+
+
+class FprintTest(unittest.TestCase):
+    TEXT = """['a"<b>&c', 0, f(x)]"""
+    EXPECTED = """\
+<?xml version="1.0" ?>
+<LIST>
+   <STR value="a&quot;&lt;b&gt;&amp;c"/>
+   <NUM value="0"/>
+   <CALL>
+      <VAR value="f"/>
+      <ARGS>
+         <VAR value="x"/>
+      </ARGS>
+   </CALL>
+</LIST>
+"""
+
+    def test_out(self):
+        out = io.StringIO()
+        sample_parser.fprint(parser.parse(self.TEXT), out=out)
+        self.assertEqual(out.getvalue(), self.EXPECTED)
+
+    def test_redirect_stdout(self):
+        # sys.stdout is looked up per call, not when the script is loaded
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            sample_parser.fprint(parser.parse(self.TEXT))
+        self.assertEqual(out.getvalue(), self.EXPECTED)
+
+
+if __name__ == "__main__":
+    unittest.main()
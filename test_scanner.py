@@ -0,0 +1,80 @@
+import random
+import sys
+import unittest
+from unittest import mock
+
+import parser
+import scanner
+
+
+# Token fragments to build random texts from, weighted towards the
+# characters where the scanner needs lookahead
+FRAGMENTS = list(
+    "-:>&|!<=@.#+/*%^({[)}],'\"\\_ \t\n\x0b\x0c\x1c\x1f\r0123456789aZx"
+) + ["#item", "#index", "#item_", "#index_1", "<=>", "->", "@(", ".5", "\x00", "~"]
+
+
+def tokens_of(tokenize, text):
+    try:
+        tokens = tokenize(text)
+    except parser.TokenError as exc:
+        return str(exc)
+    return (
+        tokens.types,
+        tokens.variants,
+        tokens.strings,
+        list(tokens.starts),
+        list(tokens.ends),
+    )
+
+
+def regex_tokenize(text):
+    with mock.patch.object(parser, "SCANNER", False):
+        return parser.tokenize(text, parser.PATTERN)
+
+
+class ScannerTest(unittest.TestCase):
+    def test_table_matches_token_table(self):
+        # Patterns included: any edit to parser.tokens must reach scan() too
+        self.assertEqual(scanner.TABLE, parser.tokens)
+        self.assertTrue(parser.SCANNER)
+
+    def test_matches_regex_tokenizer(self):
+        # Runs uncompiled without Numba; the state machine is the same
+        rng = random.Random(1)
+        for _ in range(5000):
+            size = rng.randint(0, 30)
+            text = "".join(rng.choice(FRAGMENTS) for _ in range(size))
+            with self.subTest(text=text):
+                self.assertEqual(
+                    tokens_of(parser.scan_tokens, text),
+                    tokens_of(regex_tokenize, text),
+                )
+
+    def test_sample_inputs(self):
+        for text in [
+            r"""-1+hello(1, 'w\"orld', 3)*2-(1+1)""",
+            r"split(Player, '\\')[1]",
+            r"mapIf(['icecream', 'cake', 'soda'], length(#item)>4, upper(#item))",
+            r"['fruit' ->   'apple',  'vegetable' -> 'carrot']",
+            r"x := [y -> 2, z->3]",
+        ]:
+            with self.subTest(text=text):
+                self.assertEqual(
+                    tokens_of(parser.scan_tokens, text),
+                    tokens_of(regex_tokenize, text),
+                )
+
+    def test_broken_numba_falls_back(self):
+        # An installed Numba that fails to import switches the scanner off
+        text = "x + 1 " * (scanner.MIN_LENGTH // 6 + 1)
+        with mock.patch.dict(sys.modules, {"numba": None}), mock.patch.multiple(
+            scanner, NUMBA=True, np=None
+        ):
+            tokens = tokens_of(lambda text: parser.tokenize(text, parser.PATTERN), text)
+            self.assertFalse(scanner.NUMBA)
+        self.assertEqual(tokens, tokens_of(regex_tokenize, text))
+
+
+if __name__ == "__main__":
+    unittest.main()